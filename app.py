@@ -1,13 +1,16 @@
 import os
+import hmac
 import logging
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
 from email_service import EmailService
 from validators import FormValidator
+from sender_throttle import SenderThrottle
+from tenants import TenantConfigStore
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -17,14 +20,69 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Configure CORS
+# Multi-tenant mode: route requests by API key or Origin to per-tenant settings
+MULTI_TENANT = os.getenv("MULTI_TENANT_ENABLED", "false").lower() in ('1', 'true', 'yes')
+tenant_store = TenantConfigStore() if MULTI_TENANT else None
+
+# Configure CORS (in multi-tenant mode headers come from the tenant's allowed_origins)
 # UWAGA: W produkcji zmień origins=["*"] na konkretne domeny
 # Przykład: origins=["https://twoja-strona.netlify.app", "https://twoja-domena.com"]
-CORS(app, origins=["*"])
+if not MULTI_TENANT:
+    CORS(app, origins=["*"])
+
+def get_tenant():
+    """Resolve tenant for the current request (multi-tenant mode only)"""
+    if 'tenant' not in g:
+        g.tenant = None
+        if tenant_store:
+            try:
+                g.tenant = tenant_store.resolve(
+                    api_key=request.headers.get('X-API-Key'),
+                    origin=request.headers.get('Origin')
+                )
+            except Exception as e:
+                logger.error(f"Error resolving tenant: {str(e)}")
+    return g.tenant
+
+@app.after_request
+def tenant_cors_headers(response):
+    """Allow the request Origin if its tenant lists it"""
+    origin = request.headers.get('Origin')
+    if not tenant_store or not origin:
+        return response
+
+    if request.method == 'OPTIONS':
+        # Preflights carry no X-API-Key, so answer for any tenant accepting
+        # the origin; the POST itself is checked against its tenant by check_tenant
+        if tenant_store.is_origin_allowed(origin):
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, X-API-Key'
+    else:
+        tenant = get_tenant()
+        if tenant and tenant.allowed_origins and tenant.is_origin_allowed(origin):
+            response.headers['Access-Control-Allow-Origin'] = origin
+    response.headers.add('Vary', 'Origin')
+    return response
+
+def rate_limit_key():
+    """Rate limit per client IP, separately for each tenant"""
+    tenant = get_tenant()
+    return f"{tenant.id}:{get_remote_address()}" if tenant else get_remote_address()
+
+def contact_rate_limit():
+    """Contact form limit, overridable per tenant"""
+    tenant = get_tenant()
+    return tenant.rate_limits.get('contact', "5 per minute") if tenant else "5 per minute"
+
+def reservation_rate_limit():
+    """Reservation form limit, overridable per tenant"""
+    tenant = get_tenant()
+    return tenant.rate_limits.get('reservation', "3 per minute") if tenant else "3 per minute"
 
 # Configure rate limiting
 limiter = Limiter(
-    key_func=get_remote_address,
+    key_func=rate_limit_key,
     app=app,
     default_limits=["100 per hour"]
 )
@@ -32,6 +90,7 @@ limiter = Limiter(
 # Initialize services
 email_service = EmailService()
 form_validator = FormValidator()
+sender_throttle = SenderThrottle()
 
 @app.route('/')
 def index():
@@ -43,11 +102,32 @@ def test_forms():
     """Test page with sample forms"""
     return render_template('test_forms.html')
 
+def check_tenant():
+    """Return an error response if the request has no valid tenant"""
+    if not tenant_store:
+        return None
+    tenant = get_tenant()
+    if tenant is None:
+        return jsonify({'error': 'Unknown tenant'}), 403
+    if not tenant.is_origin_allowed(request.headers.get('Origin')):
+        logger.warning(f"Origin {request.headers.get('Origin')} not allowed for tenant {tenant.id}")
+        return jsonify({'error': 'Origin not allowed'}), 403
+    return None
+
+def get_email_service():
+    """Email service of the current tenant, or the default one"""
+    tenant = get_tenant()
+    return tenant.email_service if tenant else email_service
+
 @app.route('/api/contact', methods=['POST'])
-@limiter.limit("5 per minute")  # Strict rate limiting for contact form
+@limiter.limit(contact_rate_limit)  # Strict rate limiting for contact form
 def contact_form():
     """Handle contact form submissions"""
     try:
+        tenant_error = check_tenant()
+        if tenant_error:
+            return tenant_error
+
         # Get JSON data
         data = request.get_json()
         if not data:
@@ -63,8 +143,14 @@ def contact_form():
             logger.warning(f"Honeypot triggered from IP: {get_remote_address()}")
             return jsonify({'error': 'Invalid submission'}), 400
 
+        # Per-sender throttling (email, phone, message content)
+        throttle_result = sender_throttle.check(validation_result['data'], scope=getattr(get_tenant(), 'id', None))
+        if not throttle_result['allowed']:
+            logger.warning(f"Sender throttle blocked contact form from IP: {get_remote_address()}")
+            return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
+
         # Send email
-        email_result = email_service.send_contact_email(validation_result['data'])
+        email_result = get_email_service().send_contact_email(validation_result['data'])
         if not email_result['success']:
             logger.error(f"Failed to send contact email: {email_result['error']}")
             return jsonify({'error': 'Failed to send message'}), 500
@@ -77,10 +163,14 @@ def contact_form():
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/reservation', methods=['POST'])
-@limiter.limit("3 per minute")  # Even stricter rate limiting for reservations
+@limiter.limit(reservation_rate_limit)  # Even stricter rate limiting for reservations
 def reservation_form():
     """Handle reservation form submissions"""
     try:
+        tenant_error = check_tenant()
+        if tenant_error:
+            return tenant_error
+
         # Get JSON data
         data = request.get_json()
         if not data:
@@ -96,8 +186,14 @@ def reservation_form():
             logger.warning(f"Honeypot triggered from IP: {get_remote_address()}")
             return jsonify({'error': 'Invalid submission'}), 400
 
+        # Per-sender throttling (email, phone, message content)
+        throttle_result = sender_throttle.check(validation_result['data'], scope=getattr(get_tenant(), 'id', None))
+        if not throttle_result['allowed']:
+            logger.warning(f"Sender throttle blocked reservation form from IP: {get_remote_address()}")
+            return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
+
         # Send email
-        email_result = email_service.send_reservation_email(validation_result['data'])
+        email_result = get_email_service().send_reservation_email(validation_result['data'])
         if not email_result['success']:
             logger.error(f"Failed to send reservation email: {email_result['error']}")
             return jsonify({'error': 'Failed to send reservation'}), 500
@@ -112,11 +208,30 @@ def reservation_form():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'email_service': email_service.test_connection()
-    }), 200
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    # Tenants use their own SMTP accounts, so skip the env-default login
+    if not tenant_store:
+        health['email_service'] = email_service.test_connection()
+    return jsonify(health), 200
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Operator statistics, only with a matching X-Stats-Token"""
+    stats_token = os.getenv("STATS_TOKEN")
+    if not stats_token:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Stats-Token', ''), stats_token):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    result = {
+        'sender_throttle': sender_throttle.get_stats()
+    }
+    if tenant_store:
+        result['tenants'] = tenant_store.get_stats()
+    return jsonify(result), 200
 
 @app.errorhandler(429)
 def ratelimit_handler(e):
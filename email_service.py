@@ -3,36 +3,69 @@ import json
 import smtplib
 import logging
 import secrets
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 from datetime import datetime
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=1)
+def _load_default_translations():
+    """Load translations from JSON file once per process"""
+    try:
+        with open('translations.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load translations: {str(e)}")
+        # Fallback to empty dict if file not found
+        return {"pl": {"contact": {}, "reservation": {}}, "en": {"contact": {}, "reservation": {}}}
+
 class EmailService:
-    def __init__(self):
-        #  SMTP Gmail Server
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
 
-        self.sender_email = os.getenv("GMAIL_EMAIL", "your-email@gmail.com")
-        self.sender_password = os.getenv("GMAIL_APP_PASSWORD", "your-app-password") 
-        self.recipient_email = os.getenv("RECIPIENT_EMAIL", self.sender_email)
+        #  SMTP Gmail Server
+        self.smtp_server = settings.get('smtp_server', "smtp.gmail.com")
+        self.smtp_port = int(settings.get('smtp_port', 587))
+
+        if settings:
+            # Tenant settings from the config store
+            self.sender_email = settings['sender_email']
+            self.sender_password = settings.get('sender_password', '')
+            self.recipient_email = ', '.join(settings.get('recipient_emails') or [self.sender_email])
+        else:
+            self.sender_email = os.getenv("GMAIL_EMAIL", "your-email@gmail.com")
+            self.sender_password = os.getenv("GMAIL_APP_PASSWORD", "your-app-password") 
+            self.recipient_email = os.getenv("RECIPIENT_EMAIL", self.sender_email)
 
         # Load translations
-        self.translations = self._load_translations()
-
-    def _load_translations(self):
-        """Load translations from JSON file"""
-        try:
-            with open('translations.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to load translations: {str(e)}")
-            # Fallback to empty dict if file not found
-            return {"pl": {"contact": {}, "reservation": {}}, "en": {"contact": {}, "reservation": {}}}
+        self.translations = self._load_translations(settings.get('translations'))
+
+        # Small pool of reused SMTP connections, so concurrent sends do not wait on each other
+        self.smtp_pool_size = int(os.getenv("SMTP_POOL_SIZE", "2"))
+        # Gmail drops idle sessions, so older connections are closed instead of reused
+        self.smtp_idle_timeout = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+        self._idle_connections = []
+        self._pool_lock = threading.Lock()
+        self._closed = False
+
+    def _load_translations(self, overrides=None):
+        """Load shared translations and apply per-tenant label overrides"""
+        translations = _load_default_translations()
+        if not overrides:
+            return translations
+
+        merged = {lang: dict(forms) for lang, forms in translations.items()}
+        for lang, forms in overrides.items():
+            merged.setdefault(lang, {})
+            for form_type, labels in forms.items():
+                merged[lang][form_type] = {**merged[lang].get(form_type, {}), **labels}
+        return merged
 
     def _get_labels(self, language, form_type):
         """Get translated labels for specific language and form type"""
@@ -70,6 +103,106 @@ class EmailService:
             logger.error(f"SMTP connection test failed: {str(e)}")
             return False
 
+    def _connect(self):
+        """Open and log in a new SMTP connection"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        server.starttls()
+        server.login(self.sender_email, self.sender_password)
+        return server
+
+    def _quit(self, server):
+        """Close an SMTP connection, ignoring errors from dead sockets"""
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def _take_expired(self):
+        """Remove and return idle connections past the idle timeout (call with pool lock held)"""
+        now = time.monotonic()
+        expired = [server for server, last_used in self._idle_connections if now - last_used >= self.smtp_idle_timeout]
+        self._idle_connections = [
+            (server, last_used) for server, last_used in self._idle_connections
+            if now - last_used < self.smtp_idle_timeout
+        ]
+        return expired
+
+    def reap_idle_connections(self):
+        """Close idle connections past the idle timeout"""
+        with self._pool_lock:
+            expired = self._take_expired()
+        for server in expired:
+            self._quit(server)
+        return len(expired)
+
+    def _acquire_connection(self):
+        """Take a fresh idle connection from the pool, or None"""
+        with self._pool_lock:
+            expired = self._take_expired()
+            server = self._idle_connections.pop()[0] if self._idle_connections else None
+        for stale in expired:
+            self._quit(stale)
+        return server
+
+    def _release_connection(self, server):
+        """Return a healthy connection to the pool, or close it when the pool is full or closed"""
+        with self._pool_lock:
+            expired = self._take_expired()
+            pooled = not self._closed and len(self._idle_connections) < self.smtp_pool_size
+            if pooled:
+                self._idle_connections.append((server, time.monotonic()))
+        for stale in expired:
+            self._quit(stale)
+        if not pooled:
+            self._quit(server)
+
+    def _is_alive(self, server):
+        """Probe a reused connection before sending anything on it"""
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _send_message(self, msg):
+        """Send message, retrying on a new connection only when a reused one was lost before DATA"""
+        server = self._acquire_connection()
+        if server is not None and not self._is_alive(server):
+            logger.warning("Reused SMTP connection is dead, reconnecting")
+            self._quit(server)
+            server = None
+
+        if server is not None:
+            try:
+                server.send_message(msg)
+                self._release_connection(server)
+                return
+            except smtplib.SMTPSenderRefused as e:
+                # 421 on MAIL FROM: the session timed out and nothing was sent yet
+                self._quit(server)
+                if e.smtp_code != 421:
+                    raise
+                logger.warning(f"Reused SMTP connection timed out, reconnecting: {str(e)}")
+            except Exception:
+                # The server may already have accepted DATA, so never resend
+                self._quit(server)
+                raise
+
+        server = self._connect()
+        try:
+            server.send_message(msg)
+        except Exception:
+            self._quit(server)
+            raise
+        self._release_connection(server)
+
+    def close(self):
+        """Close pooled SMTP connections; connections still sending are closed on release"""
+        with self._pool_lock:
+            self._closed = True
+            idle_connections, self._idle_connections = self._idle_connections, []
+        for server, _ in idle_connections:
+            self._quit(server)
+
     def send_contact_email(self, form_data):
         """Send contact form email"""
         try:
@@ -98,10 +231,7 @@ class EmailService:
             msg.attach(MIMEText(html_body, 'html', 'utf-8'))
 
             # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
+            self._send_message(msg)
 
             logger.info(f"Contact email sent successfully for {form_data['name']}")
             return {'success': True}
@@ -138,10 +268,7 @@ class EmailService:
             msg.attach(MIMEText(html_body, 'html', 'utf-8'))
 
             # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
+            self._send_message(msg)
 
             logger.info(f"Reservation email sent successfully for {form_data['name']}")
             return {'success': True}
@@ -0,0 +1,265 @@
+import os
+import re
+import math
+import time
+import hashlib
+import logging
+import secrets
+import threading
+from array import array
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class SlidingCountMinSketch:
+    """Count-min sketch over a sliding time window.
+
+    The window is split into a fixed ring of buckets, each holding its own
+    depth x width counter table, so memory stays constant no matter how many
+    distinct keys are seen. Buckets older than the window are cleared lazily
+    when their slot is reused. Updates are conservative: a row is only raised
+    as far as needed to keep the key's estimate exact, which keeps collisions
+    from inflating counts of unrelated keys.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, window_seconds: int = 3600, bucket_count: int = 6):
+        self.width = width
+        self.depth = depth
+        self.window_seconds = window_seconds
+        self.bucket_count = bucket_count
+        self.bucket_span = window_seconds / bucket_count
+
+        # Secret hash key so senders cannot craft colliding keys
+        self._hash_key = secrets.token_bytes(16)
+
+        self._buckets = [self._new_table() for _ in range(bucket_count)]
+        self._bucket_epochs = [-1] * bucket_count
+        # Items added and non-zero cells of the first row, per bucket
+        self._bucket_items = [0] * bucket_count
+        self._bucket_filled = [0] * bucket_count
+
+    def _new_table(self) -> List[array]:
+        """Create an empty depth x width counter table"""
+        return [array('I', bytes(4 * self.width)) for _ in range(self.depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        """Hash key into one column index per row"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth, key=self._hash_key).digest()
+        return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'little') % self.width for i in range(self.depth)]
+
+    def _current_epoch(self, now: float) -> int:
+        """Rotate the ring to the bucket for the given time and return its epoch"""
+        epoch = int(now // self.bucket_span)
+        slot = epoch % self.bucket_count
+        if self._bucket_epochs[slot] != epoch:
+            self._buckets[slot] = self._new_table()
+            self._bucket_epochs[slot] = epoch
+            self._bucket_items[slot] = 0
+            self._bucket_filled[slot] = 0
+        return epoch
+
+    def _live_slots(self, epoch: int) -> List[int]:
+        """Ring slots whose bucket is still inside the window"""
+        oldest_epoch = epoch - self.bucket_count + 1
+        return [slot for slot, bucket_epoch in enumerate(self._bucket_epochs) if bucket_epoch >= oldest_epoch]
+
+    def _row_sums(self, indexes: List[int], epoch: int) -> List[int]:
+        """Sum live buckets for each row's cell"""
+        live_tables = [self._buckets[slot] for slot in self._live_slots(epoch)]
+        return [sum(table[row][index] for table in live_tables) for row, index in enumerate(indexes)]
+
+    def add(self, key: str, now: float, count: int = 1) -> int:
+        """Increment key and return its estimated count within the window"""
+        epoch = self._current_epoch(now)
+        slot = epoch % self.bucket_count
+        indexes = self._indexes(key)
+        row_sums = self._row_sums(indexes, epoch)
+        target = min(row_sums) + count
+
+        # Conservative update: only raise rows that fall below the new estimate
+        table = self._buckets[slot]
+        for row, (index, row_sum) in enumerate(zip(indexes, row_sums)):
+            if row_sum < target:
+                if row == 0 and table[row][index] == 0:
+                    self._bucket_filled[slot] += 1
+                table[row][index] = min(table[row][index] + target - row_sum, 0xFFFFFFFF)
+        self._bucket_items[slot] += count
+        return target
+
+    def estimate(self, key: str, now: float) -> int:
+        """Return estimated count for key within the window"""
+        epoch = self._current_epoch(now)
+        return min(self._row_sums(self._indexes(key), epoch))
+
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        """Return fill and error bound of the sketch"""
+        epoch = self._current_epoch(now)
+        window_items = sum(self._bucket_items[slot] for slot in self._live_slots(epoch))
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'window_items': window_items,
+            'current_bucket_fill': self._bucket_filled[epoch % self.bucket_count] / self.width,
+            # Overestimate stays below this with probability 1 - e^-depth
+            'error_bound': math.e * window_items / self.width,
+        }
+
+class SenderThrottle:
+    """Per-sender abuse throttling keyed on email, phone and message content"""
+
+    DIMENSIONS = ('email', 'phone', 'message')
+
+    # Shorter messages are common greetings, not a sender fingerprint
+    MIN_MESSAGE_LENGTH = 40
+    MIN_MESSAGE_WORDS = 8
+
+    def __init__(self):
+        self.enabled = os.getenv("SENDER_THROTTLE_ENABLED", "true").lower() not in ('0', 'false', 'no')
+        window_seconds = int(os.getenv("SENDER_THROTTLE_WINDOW", "3600"))
+
+        # Maximum submissions per window for each sender key
+        self.limits = {
+            'email': int(os.getenv("SENDER_THROTTLE_EMAIL_LIMIT", "5")),
+            'phone': int(os.getenv("SENDER_THROTTLE_PHONE_LIMIT", "5")),
+            'message': int(os.getenv("SENDER_THROTTLE_MESSAGE_LIMIT", "3")),
+        }
+
+        # Width keeps the overestimate (e * keys / width) under half the lowest limit
+        expected_submissions = int(os.getenv("SENDER_THROTTLE_EXPECTED_SUBMISSIONS", "5000"))
+        self.max_error = min(self.limits.values()) / 2
+        default_width = self._sketch_width(expected_submissions * len(self.DIMENSIONS), self.max_error)
+
+        self.sketch = SlidingCountMinSketch(
+            width=int(os.getenv("SENDER_THROTTLE_SKETCH_WIDTH", str(default_width))),
+            depth=int(os.getenv("SENDER_THROTTLE_SKETCH_DEPTH", "4")),
+            window_seconds=window_seconds,
+        )
+
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._blocked = 0
+        self._hits = {dimension: 0 for dimension in self.DIMENSIONS}
+        self._saturated = False
+
+    def _sketch_width(self, expected_keys: int, max_error: float) -> int:
+        """Smallest power of two width with e * expected_keys / width <= max_error"""
+        width = 1024
+        while math.e * expected_keys / width > max_error:
+            width *= 2
+        return width
+
+    def check(self, form_data: Dict[str, Any], now: Optional[float] = None, scope: Optional[str] = None) -> Dict[str, Any]:
+        """Record a validated submission and decide whether it may be sent"""
+        if not self.enabled:
+            return {'allowed': True, 'reasons': []}
+
+        now = time.time() if now is None else now
+        keys = self._sender_keys(form_data)
+        sketch_keys = {
+            dimension: f"{scope}:{dimension}:{key}" if scope else f"{dimension}:{key}"
+            for dimension, key in keys.items()
+        }
+        reasons = []
+
+        with self._lock:
+            self._checks += 1
+            for dimension, sketch_key in sketch_keys.items():
+                if self.sketch.estimate(sketch_key, now) >= self.limits[dimension]:
+                    self._hits[dimension] += 1
+                    reasons.append(dimension)
+
+            # Only allowed submissions are counted, so blocked floods do not fill the sketch
+            if reasons:
+                self._blocked += 1
+            else:
+                for sketch_key in sketch_keys.values():
+                    self.sketch.add(sketch_key, now)
+            saturation = self._check_saturation(now)
+
+        if reasons:
+            logger.warning(f"Sender throttle triggered on: {', '.join(reasons)}")
+        if saturation:
+            logger.warning(f"Sender throttle sketch saturated: error bound {saturation['error_bound']:.2f} "
+                           f"over {saturation['window_items']} keys, raise SENDER_THROTTLE_SKETCH_WIDTH")
+
+        return {'allowed': not reasons, 'reasons': reasons}
+
+    def _check_saturation(self, now: float) -> Optional[Dict[str, Any]]:
+        """Return sketch stats the first time the error bound exceeds max_error"""
+        stats = self.sketch.get_stats(now)
+        saturated = stats['error_bound'] > self.max_error
+        warn = saturated and not self._saturated
+        self._saturated = saturated
+        return stats if warn else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return throttle counters, hit rates and sketch saturation"""
+        with self._lock:
+            checks = self._checks
+            return {
+                'enabled': self.enabled,
+                'checks': checks,
+                'blocked': self._blocked,
+                'block_rate': self._blocked / checks if checks else 0.0,
+                'hit_rates': {
+                    dimension: hits / checks if checks else 0.0
+                    for dimension, hits in self._hits.items()
+                },
+                'sketch': {
+                    **self.sketch.get_stats(time.time()),
+                    'max_error': self.max_error,
+                    'saturated': self._saturated,
+                },
+            }
+
+    def _sender_keys(self, form_data: Dict[str, Any]) -> Dict[str, str]:
+        """Build normalized throttle keys for each available dimension"""
+        keys = {}
+
+        email = self._normalize_email(form_data.get('email', ''))
+        if email:
+            keys['email'] = email
+
+        phone = self._normalize_phone(form_data.get('phone', ''))
+        if phone:
+            keys['phone'] = phone
+
+        fingerprint = self._message_fingerprint(form_data.get('message') or form_data.get('additional_info') or '')
+        if fingerprint:
+            keys['message'] = fingerprint
+
+        return keys
+
+    def _normalize_email(self, value: str) -> str:
+        """Lowercase email and drop +tag aliases"""
+        if not isinstance(value, str) or '@' not in value:
+            return ''
+
+        local, _, domain = value.strip().lower().rpartition('@')
+        local = local.split('+', 1)[0]
+        # Gmail ignores dots in the local part
+        if domain in ('gmail.com', 'googlemail.com'):
+            local = local.replace('.', '')
+            domain = 'gmail.com'
+        return f"{local}@{domain}"
+
+    def _normalize_phone(self, value: str) -> str:
+        """Reduce phone to digits with 00 prefix treated as +"""
+        if not isinstance(value, str):
+            return ''
+
+        digits = re.sub(r'\D', '', value)
+        if value.strip().startswith('00'):
+            digits = digits[2:]
+        return digits
+
+    def _message_fingerprint(self, value: str) -> str:
+        """Fingerprint message content ignoring case, punctuation and spacing"""
+        if not isinstance(value, str):
+            return ''
+
+        words = re.findall(r'\w+', value.lower())
+        normalized = ' '.join(words)
+        if len(normalized) < self.MIN_MESSAGE_LENGTH or len(words) < self.MIN_MESSAGE_WORDS:
+            return ''
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from limits import parse_many
+from typing import Dict, Any, List, Optional
+from email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+class Tenant:
+    """Settings and services for a single site served by this deployment"""
+
+    def __init__(self, tenant_id: str, settings: Dict[str, Any], mtime: float):
+        self.id = tenant_id
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+
+        self.allowed_origins = settings.get('allowed_origins', [])
+        self.rate_limits = settings.get('rate_limits', {})
+
+        # Keep SMTP password out of the JSON file when possible
+        email_settings = dict(settings)
+        password_env = settings.get('sender_password_env')
+        if password_env:
+            email_settings['sender_password'] = os.getenv(password_env, '')
+
+        self.email_service = EmailService(email_settings)
+
+    def is_origin_allowed(self, origin: Optional[str]) -> bool:
+        """Check request Origin against tenant CORS origins"""
+        if not origin or not self.allowed_origins:
+            return True
+        return '*' in self.allowed_origins or origin in self.allowed_origins
+
+    def close(self):
+        """Release tenant resources"""
+        self.email_service.close()
+
+class TenantConfigStore:
+    """Per-tenant settings loaded from local JSON files into an LRU cache.
+
+    Each tenant lives in ``<config_dir>/<tenant_id>.json``. Only the routing
+    index (API keys and origins) is kept for every tenant; full settings and
+    their EmailService are cached for the most recently used tenants.
+    """
+
+    def __init__(self, config_dir: Optional[str] = None, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.config_dir = config_dir or os.getenv("TENANTS_DIR", "tenants")
+        self.max_size = max_size or int(os.getenv("TENANT_CACHE_SIZE", "128"))
+        # Seconds between checks of a cached tenant file for changes
+        self.ttl = ttl if ttl is not None else float(os.getenv("TENANT_CACHE_TTL", "30"))
+
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._api_keys = {}
+        self._origins = {}
+        # Every origin any tenant accepts, including ambiguous ones, for CORS preflight
+        self._cors_origins = set()
+        self._any_origin = False
+        self._index_signature = None
+        self._index_checked_at = 0.0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._reaped_at = time.monotonic()
+
+    def resolve(self, api_key: Optional[str] = None, origin: Optional[str] = None) -> Optional[Tenant]:
+        """Find tenant by API key, falling back to request Origin"""
+        with self._lock:
+            self._refresh_index()
+            tenant_id = self._api_keys.get(api_key) if api_key else None
+            if tenant_id is None and origin:
+                tenant_id = self._origins.get(origin)
+        if tenant_id is None:
+            return None
+        tenant = self.get(tenant_id)
+
+        # Tenants that stopped sending still hold pooled sockets until reaped
+        if time.monotonic() - self._reaped_at >= self.ttl:
+            self.reap_idle_connections()
+        return tenant
+
+    def is_origin_allowed(self, origin: str) -> bool:
+        """Check whether any tenant accepts browser requests from origin"""
+        with self._lock:
+            self._refresh_index()
+            return self._any_origin or origin in self._cors_origins
+
+    def get(self, tenant_id: str) -> Optional[Tenant]:
+        """Return cached tenant, loading or reloading it from disk if needed"""
+        with self._lock:
+            tenant = self._cache.get(tenant_id)
+            if tenant is not None and not self._is_stale(tenant):
+                self._cache.move_to_end(tenant_id)
+                self._hits += 1
+                return tenant
+
+            self._misses += 1
+            if tenant is not None:
+                self._evict(tenant_id)
+
+            tenant = self._load(tenant_id)
+            if tenant is None:
+                return None
+
+            self._cache[tenant_id] = tenant
+            while len(self._cache) > self.max_size:
+                self._evict(next(iter(self._cache)))
+                self._evictions += 1
+            return tenant
+
+    def invalidate(self, tenant_id: Optional[str] = None):
+        """Drop one tenant, or all tenants and the routing index, from the cache"""
+        with self._lock:
+            if tenant_id is not None:
+                if tenant_id in self._cache:
+                    self._evict(tenant_id)
+                return
+
+            for cached_id in list(self._cache):
+                self._evict(cached_id)
+            self._index_signature = None
+            self._index_checked_at = 0.0
+
+    def reap_idle_connections(self) -> int:
+        """Close expired idle SMTP connections of all cached tenants"""
+        with self._lock:
+            tenants = list(self._cache.values())
+            self._reaped_at = time.monotonic()
+        return sum(tenant.email_service.reap_idle_connections() for tenant in tenants)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        self.reap_idle_connections()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'tenants': len(set(self._api_keys.values()) | set(self._origins.values())),
+                'cached': len(self._cache),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+
+    def _path(self, tenant_id: str) -> str:
+        return os.path.join(self.config_dir, f"{tenant_id}.json")
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        """Read and validate a tenant JSON file"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                settings = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load tenant config {path}: {str(e)}")
+            return None
+
+        error = self._validate(settings)
+        if error:
+            logger.error(f"Invalid tenant config {path}: {error}")
+            return None
+        return settings
+
+    def _validate(self, settings: Any) -> Optional[str]:
+        """Return a description of the first problem in tenant settings, or None"""
+        if not isinstance(settings, dict):
+            return 'expected a JSON object'
+
+        for field in ('api_keys', 'allowed_origins', 'recipient_emails'):
+            value = settings.get(field, [])
+            if not isinstance(value, list) or not all(isinstance(item, str) and item for item in value):
+                return f"'{field}' must be a list of non-empty strings"
+
+        for field in ('sender_email', 'sender_password', 'sender_password_env', 'smtp_server'):
+            if field in settings and not isinstance(settings[field], str):
+                return f"'{field}' must be a string"
+
+        smtp_port = settings.get('smtp_port', 587)
+        if not isinstance(smtp_port, int) or isinstance(smtp_port, bool):
+            return "'smtp_port' must be an integer"
+
+        rate_limits = settings.get('rate_limits', {})
+        if not isinstance(rate_limits, dict):
+            return "'rate_limits' must be an object of limit strings"
+        for form_type, value in rate_limits.items():
+            if form_type not in ('contact', 'reservation'):
+                return f"'rate_limits' has unknown form type '{form_type}'"
+            try:
+                parse_many(value)
+            except (ValueError, TypeError):
+                return f"'rate_limits.{form_type}' is not a valid limit: {value!r}"
+
+        translations = settings.get('translations', {})
+        if not isinstance(translations, dict) or not all(
+            isinstance(forms, dict) and all(isinstance(labels, dict) for labels in forms.values())
+            for forms in translations.values()
+        ):
+            return "'translations' must map language to form type to labels"
+
+        return None
+
+    def _load(self, tenant_id: str) -> Optional[Tenant]:
+        """Build a tenant from its config file"""
+        path = self._path(tenant_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            logger.warning(f"Tenant config not found: {tenant_id}")
+            return None
+
+        settings = self._read(path)
+        if settings is None:
+            return None
+        if not settings.get('sender_email'):
+            logger.error(f"Tenant {tenant_id} has no sender_email configured")
+            return None
+
+        try:
+            tenant = Tenant(tenant_id, settings, mtime)
+        except Exception as e:
+            logger.error(f"Failed to create tenant {tenant_id}: {str(e)}")
+            return None
+
+        logger.info(f"Loaded tenant config: {tenant_id}")
+        return tenant
+
+    def _is_stale(self, tenant: Tenant) -> bool:
+        """Check at most every ttl seconds whether the tenant file changed"""
+        now = time.monotonic()
+        if now - tenant.checked_at < self.ttl:
+            return False
+        tenant.checked_at = now
+        try:
+            return os.path.getmtime(self._path(tenant.id)) != tenant.mtime
+        except OSError:
+            return True
+
+    def _evict(self, tenant_id: str):
+        tenant = self._cache.pop(tenant_id)
+        tenant.close()
+
+    def _list_configs(self) -> List[os.DirEntry]:
+        try:
+            return [entry for entry in os.scandir(self.config_dir) if entry.name.endswith('.json') and entry.is_file()]
+        except OSError as e:
+            logger.error(f"Failed to read tenants directory {self.config_dir}: {str(e)}")
+            return []
+
+    def _refresh_index(self):
+        """Rebuild API key and origin routing when tenant files change"""
+        now = time.monotonic()
+        if self._index_signature is not None and now - self._index_checked_at < self.ttl:
+            return
+        self._index_checked_at = now
+
+        entries = self._list_configs()
+        signature = []
+        for entry in entries:
+            try:
+                signature.append((entry.name, entry.stat().st_mtime))
+            except OSError:
+                # File removed between scandir and stat
+                continue
+        signature.sort()
+        if signature == self._index_signature:
+            return
+
+        api_keys = {}
+        origins = {}
+        cors_origins = set()
+        any_origin = False
+        duplicates = set()
+        for name, _ in signature:
+            tenant_id = name[:-len('.json')]
+            settings = self._read(os.path.join(self.config_dir, name))
+            if settings is None:
+                continue
+            cors_origins.update(settings.get('allowed_origins', []))
+            any_origin = any_origin or '*' in settings.get('allowed_origins', [])
+            routes = [('api_key', key) for key in settings.get('api_keys', [])]
+            routes += [('origin', origin) for origin in settings.get('allowed_origins', []) if origin != '*']
+            for kind, value in routes:
+                index = api_keys if kind == 'api_key' else origins
+                if index.get(value, tenant_id) != tenant_id:
+                    duplicates.add((kind, value))
+                index[value] = tenant_id
+
+        # Never guess which tenant owns a shared key or origin
+        for kind, value in duplicates:
+            index = api_keys if kind == 'api_key' else origins
+            del index[value]
+            shown = value if kind == 'origin' else f"{value[:4]}..."
+            logger.error(f"Tenant {kind} {shown} is configured for more than one tenant, not routing it")
+
+        self._api_keys = api_keys
+        self._origins = origins
+        self._cors_origins = cors_origins
+        self._any_origin = any_origin
+        self._index_signature = signature
+        logger.info(f"Tenant routing index rebuilt: {len(signature)} tenants")
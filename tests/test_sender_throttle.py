@@ -0,0 +1,120 @@
+import os
+import unittest
+from unittest import mock
+
+from sender_throttle import SlidingCountMinSketch, SenderThrottle
+
+LONG_MESSAGE = 'Dzień dobry, chciałbym zapytać o możliwość rezerwacji terminu w przyszłym tygodniu.'
+
+class SlidingCountMinSketchTest(unittest.TestCase):
+    def setUp(self):
+        self.sketch = SlidingCountMinSketch(width=1024, depth=4, window_seconds=600, bucket_count=6)
+
+    def test_counts_keys_within_window(self):
+        for i in range(3):
+            self.sketch.add('email:a@x.pl', now=1000 + i)
+        self.assertEqual(self.sketch.estimate('email:a@x.pl', now=1010), 3)
+        self.assertEqual(self.sketch.estimate('email:b@x.pl', now=1010), 0)
+
+    def test_counts_expire_after_window(self):
+        self.sketch.add('email:a@x.pl', now=1000)
+        self.sketch.add('email:a@x.pl', now=1300)
+        self.assertEqual(self.sketch.estimate('email:a@x.pl', now=1400), 2)
+        # First bucket has left the window, second is still inside it
+        self.assertEqual(self.sketch.estimate('email:a@x.pl', now=1650), 1)
+        self.assertEqual(self.sketch.estimate('email:a@x.pl', now=2000), 0)
+
+    def test_conservative_update_keeps_colliding_keys_exact(self):
+        sketch = SlidingCountMinSketch(width=1, depth=2, window_seconds=600)
+        for _ in range(3):
+            sketch.add('a', now=1000)
+        # Every key shares the only column, so estimates are the column maximum
+        self.assertEqual(sketch.add('b', now=1000), 4)
+        self.assertEqual(sketch.estimate('a', now=1000), 4)
+
+    def test_stats_report_window_items(self):
+        self.sketch.add('a', now=1000)
+        self.sketch.add('b', now=1000)
+        stats = self.sketch.get_stats(now=1000)
+        self.assertEqual(stats['window_items'], 2)
+        self.assertGreater(stats['current_bucket_fill'], 0)
+        self.assertEqual(self.sketch.get_stats(now=5000)['window_items'], 0)
+
+class SenderThrottleTest(unittest.TestCase):
+    def setUp(self):
+        self.throttle = SenderThrottle()
+
+    def check(self, form_data, now=1000.0, scope=None):
+        return self.throttle.check(form_data, now=now, scope=scope)['allowed']
+
+    def test_blocks_email_over_limit_until_window_passes(self):
+        results = [self.check({'email': 'jan@x.pl'}) for _ in range(7)]
+        self.assertEqual(results, [True] * 5 + [False] * 2)
+        self.assertTrue(self.check({'email': 'jan@x.pl'}, now=1000 + 3600))
+
+    def test_blocked_attempts_are_not_counted(self):
+        for _ in range(20):
+            self.check({'email': 'jan@x.pl'})
+        self.assertEqual(self.throttle.sketch.estimate('email:jan@x.pl', now=1000), 5)
+
+    def test_normalizes_email_aliases(self):
+        for email in ['Jan.Kowalski@gmail.com', 'jankowalski+a@gmail.com', 'jan.kowalski+b@googlemail.com',
+                      'JANKOWALSKI@gmail.com', 'jan.ko.walski@gmail.com']:
+            self.assertTrue(self.check({'email': email}))
+        self.assertFalse(self.check({'email': 'jankowalski@gmail.com'}))
+
+    def test_normalizes_phone_prefix(self):
+        for phone in ['+48123456789', '0048123456789'] * 2 + ['+48123456789']:
+            self.assertTrue(self.check({'phone': phone}))
+        self.assertFalse(self.check({'phone': '0048123456789'}))
+
+    def test_short_messages_are_not_fingerprinted(self):
+        results = [self.check({'email': f'u{i}@x.pl', 'message': 'Dzień dobry, proszę o kontakt.'}) for i in range(5)]
+        self.assertEqual(results, [True] * 5)
+
+    def test_repeated_long_message_is_blocked_across_senders(self):
+        results = [self.check({'email': f'u{i}@x.pl', 'message': LONG_MESSAGE}) for i in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+
+    def test_reservation_additional_info_is_fingerprinted(self):
+        results = [self.check({'email': f'u{i}@x.pl', 'additional_info': LONG_MESSAGE.upper()}) for i in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_scopes_are_counted_separately(self):
+        for _ in range(5):
+            self.check({'email': 'jan@x.pl'}, scope='site-a')
+        self.assertFalse(self.check({'email': 'jan@x.pl'}, scope='site-a'))
+        self.assertTrue(self.check({'email': 'jan@x.pl'}, scope='site-b'))
+
+    def test_stats_report_hit_rates(self):
+        for _ in range(6):
+            self.check({'email': 'jan@x.pl'})
+        stats = self.throttle.get_stats()
+        self.assertEqual(stats['checks'], 6)
+        self.assertEqual(stats['blocked'], 1)
+        self.assertAlmostEqual(stats['hit_rates']['email'], 1 / 6)
+        self.assertFalse(stats['sketch']['saturated'])
+
+    def test_default_width_follows_expected_traffic(self):
+        with mock.patch.dict(os.environ, {'SENDER_THROTTLE_EXPECTED_SUBMISSIONS': '100'}):
+            small = SenderThrottle().sketch.width
+        with mock.patch.dict(os.environ, {'SENDER_THROTTLE_EXPECTED_SUBMISSIONS': '100000'}):
+            large = SenderThrottle().sketch.width
+        self.assertLess(small, large)
+
+    def test_reports_saturation(self):
+        with mock.patch.dict(os.environ, {'SENDER_THROTTLE_SKETCH_WIDTH': '64'}):
+            throttle = SenderThrottle()
+        with self.assertLogs('sender_throttle', level='WARNING'):
+            for i in range(100):
+                throttle.check({'email': f'u{i}@x.pl'}, now=1000)
+        self.assertTrue(throttle.get_stats()['sketch']['saturated'])
+
+    def test_disabled_throttle_allows_everything(self):
+        with mock.patch.dict(os.environ, {'SENDER_THROTTLE_ENABLED': 'false'}):
+            throttle = SenderThrottle()
+        results = [throttle.check({'email': 'jan@x.pl'}, now=1000)['allowed'] for _ in range(10)]
+        self.assertEqual(results, [True] * 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+
+from tenants import TenantConfigStore
+
+class TenantConfigStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = TenantConfigStore(self.tmp.name, max_size=2, ttl=0)
+
+    def write(self, tenant_id, settings, mtime=None):
+        path = os.path.join(self.tmp.name, f"{tenant_id}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def tenant(self, tenant_id, **settings):
+        config = {
+            'api_keys': [f"key-{tenant_id}"],
+            'allowed_origins': [f"https://{tenant_id}.pl"],
+            'sender_email': f"{tenant_id}@x.pl",
+        }
+        config.update(settings)
+        self.write(tenant_id, config)
+
+    def test_resolves_by_api_key_then_origin(self):
+        self.tenant('a')
+        self.tenant('b')
+        self.assertEqual(self.store.resolve(api_key='key-a').id, 'a')
+        self.assertEqual(self.store.resolve(origin='https://b.pl').id, 'b')
+        self.assertEqual(self.store.resolve(api_key='key-a', origin='https://b.pl').id, 'a')
+        self.assertIsNone(self.store.resolve(api_key='unknown'))
+
+    def test_tenant_settings_reach_email_service(self):
+        self.tenant('a', recipient_emails=['one@x.pl', 'two@x.pl'],
+                    translations={'pl': {'contact': {'title': 'Wiadomość ze strony A'}}})
+        email_service = self.store.resolve(api_key='key-a').email_service
+        self.assertEqual(email_service.sender_email, 'a@x.pl')
+        self.assertEqual(email_service.recipient_email, 'one@x.pl, two@x.pl')
+        self.assertEqual(email_service._get_labels('pl', 'contact')['title'], 'Wiadomość ze strony A')
+        self.assertEqual(email_service._get_labels('pl', 'reservation')['title'], 'Nowa rezerwacja')
+
+    def test_invalid_files_are_skipped(self):
+        self.tenant('good')
+        self.write('list', [])
+        self.tenant('string_keys', api_keys='secret')
+        self.tenant('string_recipients', recipient_emails='oops@x.pl')
+        self.tenant('bad_limit', rate_limits={'contact': '5 per minuet'})
+        self.tenant('bad_form', rate_limits={'contakt': '5 per minute'})
+        with self.assertLogs('tenants', level='ERROR') as logs:
+            self.assertEqual(self.store.resolve(api_key='key-good').id, 'good')
+        self.assertEqual(len(logs.records), 5)
+        self.assertIsNone(self.store.resolve(api_key='s'))
+        self.assertIsNone(self.store.resolve(api_key='key-bad_limit'))
+
+    def test_valid_rate_limits_are_kept(self):
+        self.tenant('a', rate_limits={'contact': '10 per minute', 'reservation': '2/minute;20/day'})
+        self.assertEqual(self.store.resolve(api_key='key-a').rate_limits['reservation'], '2/minute;20/day')
+
+    def test_shared_api_key_and_origin_are_not_routed(self):
+        self.tenant('a', api_keys=['key-a', 'shared'], allowed_origins=['https://a.pl', 'https://shared.pl'])
+        self.tenant('b', api_keys=['key-b', 'shared'], allowed_origins=['https://shared.pl'])
+        with self.assertLogs('tenants', level='ERROR'):
+            self.assertIsNone(self.store.resolve(api_key='shared'))
+        self.assertIsNone(self.store.resolve(origin='https://shared.pl'))
+        self.assertEqual(self.store.resolve(api_key='key-b').id, 'b')
+
+    def test_lru_evicts_least_recently_used_and_closes_it(self):
+        for tenant_id in ('a', 'b', 'c'):
+            self.tenant(tenant_id)
+        tenant_a = self.store.resolve(api_key='key-a')
+        tenant_b = self.store.resolve(api_key='key-b')
+        self.store.resolve(api_key='key-a')
+        self.store.resolve(api_key='key-c')
+
+        stats = self.store.get_stats()
+        self.assertEqual(stats['cached'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertTrue(tenant_b.email_service._closed)
+        self.assertFalse(tenant_a.email_service._closed)
+        self.assertIs(self.store.resolve(api_key='key-a'), tenant_a)
+
+    def test_invalidate_reloads_tenant(self):
+        self.tenant('a')
+        first = self.store.resolve(api_key='key-a')
+        self.store.invalidate('a')
+        self.assertTrue(first.email_service._closed)
+        self.assertIsNot(self.store.resolve(api_key='key-a'), first)
+
+        self.store.invalidate()
+        self.assertEqual(self.store.get_stats()['cached'], 0)
+
+    def test_changed_file_is_reloaded(self):
+        self.tenant('a')
+        first = self.store.resolve(api_key='key-a')
+        self.write('a', {'api_keys': ['key-a'], 'sender_email': 'new@x.pl'}, mtime=time.time() + 10)
+        reloaded = self.store.resolve(api_key='key-a')
+        self.assertEqual(reloaded.email_service.sender_email, 'new@x.pl')
+        self.assertTrue(first.email_service._closed)
+
+    def test_preflight_origin_allowed_for_wildcard_and_shared_origins(self):
+        self.tenant('star', allowed_origins=['*'])
+        self.tenant('a', allowed_origins=['https://shared.pl'])
+        self.tenant('b', allowed_origins=['https://shared.pl'])
+        with self.assertLogs('tenants', level='ERROR'):
+            # Preflights carry no API key, and neither origin routes to a tenant
+            self.assertIsNone(self.store.resolve(origin='https://any.pl'))
+        self.assertIsNone(self.store.resolve(origin='https://shared.pl'))
+        self.assertTrue(self.store.is_origin_allowed('https://any.pl'))
+        self.assertTrue(self.store.is_origin_allowed('https://shared.pl'))
+
+    def test_preflight_origin_rejected_without_wildcard(self):
+        self.tenant('a')
+        self.assertTrue(self.store.is_origin_allowed('https://a.pl'))
+        self.assertFalse(self.store.is_origin_allowed('https://evil.pl'))
+
+    def test_tenant_origin_check(self):
+        self.tenant('a')
+        self.tenant('open', allowed_origins=[])
+        tenant = self.store.resolve(api_key='key-a')
+        self.assertTrue(tenant.is_origin_allowed('https://a.pl'))
+        self.assertFalse(tenant.is_origin_allowed('https://evil.pl'))
+        self.assertTrue(self.store.resolve(api_key='key-open').is_origin_allowed('https://evil.pl'))
+
+if __name__ == '__main__':
+    unittest.main()